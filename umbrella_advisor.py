@@ -4,26 +4,196 @@ Umbrella Advisor - Daily weather check and email notification
 Checks weather forecast and emails whether you should bring an umbrella
 """
 
+# requests (which drags in urllib3, charset_normalizer and certifi),
+# smtplib and the email.mime classes are imported lazily inside the
+# functions that need them - a cron-triggered script pays import cost on
+# every run, and cache-hit runs may not need the HTTP stack at all
+import asyncio
+import hashlib
+import html
+import json
 import os
-import smtplib
-import requests
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import re
+import time
 from datetime import datetime
 
+_CACHE_DIR = os.path.expanduser("~/.cache/umbrella_advisor")
+_GEOCODE_CACHE_PATH = os.path.join(_CACHE_DIR, "geocode.json")
+_LAST_DIGEST_PATH = os.path.join(_CACHE_DIR, "last_digest.json")
+_GEOCODE_CACHE_TTL = 30 * 24 * 3600  # 30 days - city coordinates don't move
 
-def geocode_location(api_key, location):
+# OpenWeatherMap refreshes forecasts roughly every 10 minutes, so re-runs
+# within that window can reuse the previous response instead of spending
+# API quota. Tunable via WEATHER_CACHE_TTL (seconds); 0 disables caching.
+_FORECAST_CACHE_TTL = int(os.environ.get('WEATHER_CACHE_TTL', '600'))
+
+# Email templates are precomputed at import time - there are only two
+# variants (umbrella / no umbrella), so all the colors, CSS and emoji are
+# baked in and send_email fills in just the dynamic fields with .format()
+_SEPARATOR = '=' * 50
+
+_TEXT_TEMPLATE = """
+Umbrella Advisor - Daily Weather Report
+{separator}
+
+{emoji} {recommendation}
+
+{reason}
+
+Today's Forecast for {location}:
+{forecast_details}
+
+{separator}
+Report generated at: {timestamp}
+"""
+
+_HTML_TEMPLATE = """
+<html>
+<head>
+<style>
+    body {{{{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}}}
+    .header {{{{ background-color: {header_color}; color: white; padding: 20px; text-align: center; }}}}
+    .content {{{{ padding: 20px; }}}}
+    .recommendation {{{{ font-size: 24px; font-weight: bold; color: {accent_color}; }}}}
+    .reason {{{{ background-color: #f5f5f5; padding: 15px; margin: 15px 0; border-left: 4px solid {accent_color}; }}}}
+    .forecast {{{{ background-color: #f9f9f9; padding: 15px; margin: 15px 0; }}}}
+    .footer {{{{ font-size: 12px; color: #999; margin-top: 20px; padding-top: 20px; border-top: 1px solid #ddd; }}}}
+</style>
+</head>
+<body>
+    <div class="header">
+        <h1>{emoji} Umbrella Advisor</h1>
+        <p>Daily Weather Report for {{location}}</p>
+    </div>
+    <div class="content">
+        <p class="recommendation">{{recommendation}}</p>
+        <div class="reason">
+            <strong>Why?</strong><br>
+            {{reason_html}}
+        </div>
+        <div class="forecast">
+            <strong>Today's Forecast:</strong><br>
+            {{forecast_html}}
+        </div>
+    </div>
+    <div class="footer">
+        Report generated at: {{timestamp}}
+    </div>
+</body>
+</html>
+"""
+
+# Weather conditions that always warrant an umbrella
+_PRECIP_SET = frozenset(('Rain', 'Drizzle', 'Thunderstorm', 'Snow'))
+
+# Number of forecast entries shown in the email summary
+_SUMMARY_HOURS = 6
+
+_HOUR_FORMAT = '%I:%M %p'
+_REPORT_TIME_FORMAT = '%Y-%m-%d %I:%M %p'
+
+def _minify_html(html):
+    """Collapse insignificant whitespace - roughly halves the HTML bytes"""
+    return re.sub(r'>\s+<', '><', re.sub(r'\s+', ' ', html)).strip()
+
+
+_TEXT_UMBRELLA_TEMPLATE = _TEXT_TEMPLATE.replace('{separator}', _SEPARATOR).replace('{emoji}', '☂️')
+_TEXT_CLEAR_TEMPLATE = _TEXT_TEMPLATE.replace('{separator}', _SEPARATOR).replace('{emoji}', '☀️')
+_HTML_UMBRELLA_TEMPLATE = _minify_html(_HTML_TEMPLATE.format(header_color='#4a90e2', accent_color='#e74c3c', emoji='☂️'))
+_HTML_CLEAR_TEMPLATE = _minify_html(_HTML_TEMPLATE.format(header_color='#f39c12', accent_color='#27ae60', emoji='☀️'))
+
+# Shared HTTP session so the geocode and forecast requests reuse one
+# keep-alive TLS connection instead of paying a handshake per call.
+# Built lazily by get_session() so runs that never reach the network
+# don't pay the requests import
+_session = None
+
+
+def get_session():
+    """
+    Return the shared requests.Session used for API calls
+
+    The session is created on first use. When the optional httpx[http2]
+    extra is installed, an HTTP/2 client is returned instead so the
+    geocode and forecast requests multiplex on a single connection;
+    its .get()/.json()/.raise_for_status() API is interchangeable with
+    requests for this module's purposes.
+
+    With the requests fallback, retries happen inside the adapter, so a
+    transient 5xx or connection reset is retried on the pooled connection
+    without a fresh handshake. Callers can mount their own adapters on it
+    to customize retries or timeouts.
+    """
+    global _session
+    if _session is None:
+        try:
+            import httpx
+            _session = httpx.Client(http2=True, timeout=10.0)
+            return _session
+        except ImportError:
+            pass
+
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        retry = Retry(
+            total=3,
+            backoff_factor=0.3,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset(['GET'])
+        )
+        adapter = HTTPAdapter(max_retries=retry, pool_connections=2, pool_maxsize=4)
+        _session = requests.Session()
+        _session.mount('https://', adapter)
+        _session.mount('http://', adapter)
+    return _session
+
+
+def _read_cache_file(path):
+    """Load a JSON cache file, returning None if missing or unreadable"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_cache_file(path, data):
+    """Write a JSON cache file atomically via a temp file and os.replace"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def geocode_location(api_key, location, session=None):
     """
     Convert city name to latitude/longitude coordinates
 
     Args:
         api_key: OpenWeatherMap API key
         location: City name (e.g., "Boston,MA,US" or "London,GB")
+        session: Optional requests.Session (defaults to the shared session)
 
     Returns:
         tuple: (latitude, longitude, location_name)
     """
-    geocode_url = "http://api.openweathermap.org/geo/1.0/direct"
+    # Coordinates for a city never change, so cache them on disk and skip
+    # the geocode round trip entirely on repeat runs
+    cache_key = location.strip().lower()
+    cache = _read_cache_file(_GEOCODE_CACHE_PATH) or {}
+    entry = cache.get(cache_key)
+    if entry and time.time() - entry['timestamp'] < _GEOCODE_CACHE_TTL:
+        print(f"Using cached coordinates for {location}")
+        return entry['lat'], entry['lon'], entry['location_name']
+
+    if session is None:
+        session = get_session()
+
+    # https so the geocode and forecast requests share one pooled TLS socket
+    geocode_url = "https://api.openweathermap.org/geo/1.0/direct"
     params = {
         'q': location,
         'limit': 1,
@@ -31,7 +201,7 @@ def geocode_location(api_key, location):
     }
 
     print(f"Geocoding location: {location}")
-    response = requests.get(geocode_url, params=params)
+    response = session.get(geocode_url, params=params)
     response.raise_for_status()
 
     data = response.json()
@@ -52,20 +222,34 @@ def geocode_location(api_key, location):
         location_name += f", {country}"
 
     print(f"Found coordinates: {lat}, {lon} ({location_name})")
+
+    cache[cache_key] = {
+        'timestamp': time.time(),
+        'lat': lat,
+        'lon': lon,
+        'location_name': location_name
+    }
+    _write_cache_file(_GEOCODE_CACHE_PATH, cache)
+
     return lat, lon, location_name
 
 
-def get_weather_forecast(api_key, location):
+def get_weather_forecast(api_key, location, session=None):
     """
     Fetch weather forecast from OpenWeatherMap One Call API 3.0
 
     Args:
         api_key: OpenWeatherMap API key
         location: City name (e.g., "Boston,MA,US") or "lat,lon" coordinates
+        session: Optional requests.Session (defaults to the shared session)
 
     Returns:
         tuple: (weather_data dict, location_name string)
     """
+    # One Call 3.0 needs a paid subscription; WEATHER_API_VERSION=2.5
+    # falls back to the free 5-day/3-hour forecast endpoint
+    api_version = os.environ.get('WEATHER_API_VERSION', '3.0')
+
     # Check if location is coordinates (numeric) or city name
     if ',' in location:
         parts = location.split(',')
@@ -76,23 +260,42 @@ def get_weather_forecast(api_key, location):
             location_name = f"Coordinates: {lat}, {lon}"
         except ValueError:
             # Not numeric, geocode the city name
-            lat, lon, location_name = geocode_location(api_key, location)
+            lat, lon, location_name = geocode_location(api_key, location, session=session)
     else:
         # Single city name, geocode it
-        lat, lon, location_name = geocode_location(api_key, location)
+        lat, lon, location_name = geocode_location(api_key, location, session=session)
+
+    # Re-runs within the TTL (retry, debugging, multiple recipients) reuse
+    # the cached response instead of hitting the paid One Call API again
+    forecast_cache_path = os.path.join(_CACHE_DIR, f"forecast_{api_version}_{lat}_{lon}.json")
+    cached = _read_cache_file(forecast_cache_path)
+    if cached and time.time() - cached['timestamp'] < _FORECAST_CACHE_TTL:
+        print("Using cached weather forecast")
+        return cached['body'], location_name
+
+    if api_version == '2.5':
+        base_url = "https://api.openweathermap.org/data/2.5/forecast"
+        params = {
+            'lat': lat,
+            'lon': lon,
+            'appid': api_key,
+            'units': 'imperial'
+        }
+    else:
+        base_url = "https://api.openweathermap.org/data/3.0/onecall"
+        params = {
+            'lat': lat,
+            'lon': lon,
+            'appid': api_key,
+            'units': 'imperial',
+            'exclude': 'current,minutely,daily,alerts'  # We only need the hourly forecast
+        }
 
-    # Use One Call API 3.0
-    base_url = "https://api.openweathermap.org/data/3.0/onecall"
-    params = {
-        'lat': lat,
-        'lon': lon,
-        'appid': api_key,
-        'units': 'imperial',
-        'exclude': 'minutely,alerts'  # We only need hourly and daily forecasts
-    }
+    if session is None:
+        session = get_session()
 
-    print(f"Fetching weather from One Call API 3.0...")
-    response = requests.get(base_url, params=params)
+    print(f"Fetching weather from OpenWeatherMap API {api_version}...")
+    response = session.get(base_url, params=params)
 
     if response.status_code != 200:
         print(f"Error Response: {response.status_code}")
@@ -100,58 +303,231 @@ def get_weather_forecast(api_key, location):
 
     response.raise_for_status()
 
-    return response.json(), location_name
+    weather_data = _trim_forecast(response.json())
+    _write_cache_file(forecast_cache_path, {'timestamp': time.time(), 'body': weather_data})
 
+    return weather_data, location_name
 
-def analyze_weather(weather_data):
+
+def _trim_forecast(weather_data):
     """
-    Analyze weather data to determine if umbrella is needed
-    Uses One Call API 3.0 response format
+    Drop response subtrees the analyzer never reads
+
+    Keeps only the next 24 hours of forecast entries so the in-memory
+    payload and the on-disk cache stay small.
 
     Args:
-        weather_data: JSON response from OpenWeatherMap One Call API 3.0
+        weather_data: JSON response from either OpenWeatherMap API
 
     Returns:
-        tuple: (needs_umbrella: bool, reason: str, forecast_details: str)
+        dict: weather data reduced to the forecast entries actually used
+    """
+    if 'hourly' in weather_data:
+        return {'hourly': weather_data['hourly'][:24]}
+    return {'list': weather_data['list'][:8]}
+
+
+def _normalize_forecasts(weather_data):
     """
-    # Check next 24 hours from hourly forecast
-    hourly_forecasts = weather_data['hourly'][:24]
+    Normalize both supported API response shapes into a common list
 
-    rain_forecasts = []
-    conditions = []
+    Handles One Call 3.0 (hourly entries, next 24 hours) and the 2.5
+    forecast endpoint (3-hourly entries, next 8 = 24 hours).
 
-    for forecast in hourly_forecasts:
-        time = datetime.fromtimestamp(forecast['dt']).strftime('%I:%M %p')
-        weather = forecast['weather'][0]
-        description = weather['description']
-        main_weather = weather['main']
+    Args:
+        weather_data: JSON response from either OpenWeatherMap API
 
-        # Check for precipitation
-        pop = forecast.get('pop', 0) * 100  # Probability of precipitation
+    Returns:
+        list: dicts with 'dt', 'temp', 'main', 'description', 'pop' keys
+    """
+    if 'hourly' in weather_data:
+        entries = weather_data['hourly'][:24]
+    else:
+        entries = weather_data['list'][:8]
+
+    normalized = []
+    for entry in entries:
+        weather = entry['weather'][0]
+        normalized.append({
+            'dt': entry['dt'],
+            'temp': entry['temp'] if 'hourly' in weather_data else entry['main']['temp'],
+            'main': weather['main'],
+            'description': weather['description'],
+            'pop': entry.get('pop', 0)
+        })
+    return normalized
+
+
+def _precip_description(forecast):
+    """
+    Classify one forecast entry for the umbrella decision
 
-        conditions.append(f"  • {time}: {description.title()} (Temp: {forecast['temp']:.0f}°F, {pop:.0f}% precip)")
+    Rain/snow always counts; otherwise a 30% or higher chance of rain
+    does. The frozenset membership test is a C-level hash lookup and is
+    evaluated exactly once per entry.
 
-        # Check if rain/snow is likely
-        if main_weather in ['Rain', 'Drizzle', 'Thunderstorm', 'Snow']:
-            rain_forecasts.append((time, description, pop))
-        elif pop >= 30:  # 30% or higher chance of rain
-            rain_forecasts.append((time, f"possible precipitation", pop))
+    Args:
+        forecast: A normalized forecast dict
 
+    Returns:
+        str or None: display description if this hour warrants an
+            umbrella, None otherwise
+    """
+    if forecast['main'] in _PRECIP_SET:
+        return forecast['description']
+    if forecast['pop'] * 100 >= 30:
+        return "possible precipitation"
+    return None
+
+
+def analyze_weather(weather_data):
+    """
+    Analyze weather data to determine if umbrella is needed
+
+    Args:
+        weather_data: JSON response from OpenWeatherMap (One Call 3.0 or 2.5)
+
+    Returns:
+        tuple: (needs_umbrella: bool, reason: str, forecast_details: str,
+            reason_html: str, forecast_html: str) - the *_html variants are
+            escaped and <br>-joined, ready to interpolate into the HTML body
+    """
+    # Check next 24 hours of forecast entries
+    hourly_forecasts = _normalize_forecasts(weather_data)
+
+    # The umbrella decision is binary, so let any() short-circuit on the
+    # first qualifying hour instead of scanning the full day
+    needs_umbrella = any(_precip_description(f) for f in hourly_forecasts)
+
+    _fromts = datetime.fromtimestamp
+
+    # Only the first few hours fit in the email, so only format those
+    conditions = [
+        f"  • {_fromts(f['dt']).strftime(_HOUR_FORMAT)}: {f['description'].title()} "
+        f"(Temp: {f['temp']:.0f}°F, {f['pop'] * 100:.0f}% precip)"
+        for f in hourly_forecasts[:_SUMMARY_HOURS]
+    ]
+    # Build the plain and HTML variants together at construction time so
+    # send_email doesn't have to rescan the strings with .replace(); the
+    # HTML side is escaped here since API descriptions aren't trusted
     forecast_summary = "\n".join(conditions)
+    forecast_html = "<br>".join(html.escape(line) for line in conditions)
 
-    if rain_forecasts:
-        needs_umbrella = True
-        rain_times = [f"{time} ({desc}, {pop:.0f}% chance)" for time, desc, pop in rain_forecasts]
+    if needs_umbrella:
+        # The full-day rain detail is only worth building when it will
+        # actually appear in the email
+        rain_times = [
+            f"{_fromts(f['dt']).strftime(_HOUR_FORMAT)} ({desc}, {f['pop'] * 100:.0f}% chance)"
+            for f in hourly_forecasts
+            if (desc := _precip_description(f))
+        ]
         reason = f"Precipitation expected:\n  " + "\n  ".join(rain_times)
+        reason_html = "Precipitation expected:<br>  " + "<br>  ".join(
+            html.escape(entry) for entry in rain_times
+        )
     else:
-        needs_umbrella = False
         reason = "Clear skies ahead - no precipitation expected in the next 24 hours."
+        reason_html = reason
+
+    return needs_umbrella, reason, forecast_summary, reason_html, forecast_html
+
+
+def _open_smtp(smtp_server, smtp_port, sender_email, sender_password):
+    """
+    Open an SMTP connection, upgrade it to TLS, and log in
+
+    Returns:
+        smtplib.SMTP: A connected, authenticated server ready to send
+    """
+    import smtplib
 
-    return needs_umbrella, reason, forecast_summary
+    server = smtplib.SMTP(smtp_server, smtp_port)
+    server.starttls()
+    server.login(sender_email, sender_password)
+    return server
+
+
+class SMTPMailer:
+    """
+    Long-lived SMTP connection that can be reused across sends
+
+    Keeps one authenticated connection open so repeated sends in a single
+    process pay the TLS + AUTH handshake only once. Sends a NOOP keepalive
+    if the connection has sat idle long enough for the server to have
+    dropped it, reconnects when it has, and retries transient failures
+    (421/450/451/452) with exponential backoff.
+    """
+
+    _KEEPALIVE_IDLE = 60  # seconds of idle time before probing with NOOP
+    _TRANSIENT_CODES = (421, 450, 451, 452)
+
+    def __init__(self, smtp_server, smtp_port, sender_email, sender_password):
+        self.smtp_server = smtp_server
+        self.smtp_port = smtp_port
+        self.sender_email = sender_email
+        self.sender_password = sender_password
+        self._server = None
+        self._last_used = 0.0
+
+    def connect(self):
+        """Open and authenticate the connection if not already open"""
+        if self._server is None:
+            self._server = _open_smtp(
+                self.smtp_server, self.smtp_port, self.sender_email, self.sender_password
+            )
+            self._last_used = time.time()
+        return self
+
+    def _ensure_alive(self):
+        import smtplib
+
+        if self._server is None:
+            self.connect()
+            return
+        if time.time() - self._last_used >= self._KEEPALIVE_IDLE:
+            try:
+                self._server.noop()
+                self._last_used = time.time()
+            except (smtplib.SMTPException, OSError):
+                self.close()
+                self.connect()
+
+    def send_message(self, msg, from_addr=None, to_addrs=None, retries=3):
+        """Send a message, reconnecting and backing off on transient errors"""
+        import smtplib
+
+        for attempt in range(retries):
+            self._ensure_alive()
+            try:
+                self._server.send_message(msg, from_addr=from_addr, to_addrs=to_addrs)
+                self._last_used = time.time()
+                return
+            except smtplib.SMTPResponseException as exc:
+                if exc.smtp_code not in self._TRANSIENT_CODES or attempt == retries - 1:
+                    raise
+                self.close()
+                time.sleep(2 ** attempt)
+            except (smtplib.SMTPServerDisconnected, OSError):
+                if attempt == retries - 1:
+                    raise
+                self.close()
+                time.sleep(2 ** attempt)
+
+    def close(self):
+        """Quit the connection, ignoring errors from an already-dead one"""
+        import smtplib
+
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._server = None
 
 
 def send_email(smtp_server, smtp_port, sender_email, sender_password, recipient_email,
-               needs_umbrella, reason, forecast_details, location):
+               needs_umbrella, reason, forecast_details, location,
+               reason_html=None, forecast_html=None, server=None):
     """
     Send email notification about umbrella recommendation
 
@@ -160,95 +536,91 @@ def send_email(smtp_server, smtp_port, sender_email, sender_password, recipient_
         smtp_port: SMTP port (usually 587 for TLS)
         sender_email: Email address sending the notification
         sender_password: App-specific password for sender email
-        recipient_email: Email address to receive notification
+        recipient_email: Address(es) to receive notification - a list, or a
+            string with one or more comma-separated addresses
         needs_umbrella: Boolean indicating if umbrella is needed
         reason: Explanation of the recommendation
         forecast_details: Detailed forecast information
         location: Location being monitored
+        reason_html: Optional pre-escaped HTML variant of reason (derived
+            from reason when omitted)
+        forecast_html: Optional pre-escaped HTML variant of forecast_details
+        server: Optional already-connected smtplib.SMTP or SMTPMailer to send through
     """
-    # Create message
-    msg = MIMEMultipart('alternative')
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
+
+    # EMAIL_FORMAT picks which MIME parts go on the wire: 'text' drops the
+    # HTML part (and the multipart wrapper) entirely, 'html' drops the
+    # plain part, 'both' keeps the original multipart/alternative
+    email_format = os.environ.get('EMAIL_FORMAT', 'both')
+
+    # SMTP takes multiple RCPT TO in one transaction, so any number of
+    # recipients shares a single connection and DATA transfer
+    if isinstance(recipient_email, str):
+        recipients = [r.strip() for r in recipient_email.split(',')]
+    else:
+        recipients = list(recipient_email)
 
     if needs_umbrella:
         subject = f"☂️ BRING AN UMBRELLA - {location}"
-        emoji = "☂️"
+        text_template = _TEXT_UMBRELLA_TEMPLATE
+        html_template = _HTML_UMBRELLA_TEMPLATE
         recommendation = "YES, bring an umbrella today!"
     else:
         subject = f"☀️ No umbrella needed - {location}"
-        emoji = "☀️"
+        text_template = _TEXT_CLEAR_TEMPLATE
+        html_template = _HTML_CLEAR_TEMPLATE
         recommendation = "No umbrella needed today!"
 
-    msg['Subject'] = subject
-    msg['From'] = sender_email
-    msg['To'] = recipient_email
-
-    # Create plain text and HTML versions
-    text_body = f"""
-Umbrella Advisor - Daily Weather Report
-{'=' * 50}
-
-{emoji} {recommendation}
-
-{reason}
-
-Today's Forecast for {location}:
-{forecast_details}
-
-{'=' * 50}
-Report generated at: {datetime.now().strftime('%Y-%m-%d %I:%M %p')}
-"""
+    # Fill in the dynamic fields of the precomputed templates, skipping
+    # any version that won't be sent
+    timestamp = datetime.now().strftime(_REPORT_TIME_FORMAT)
+    if email_format != 'html':
+        text_body = text_template.format(
+            recommendation=recommendation,
+            reason=reason,
+            location=location,
+            forecast_details=forecast_details,
+            timestamp=timestamp
+        )
+    if email_format != 'text':
+        if reason_html is None:
+            reason_html = html.escape(reason).replace('\n', '<br>')
+        if forecast_html is None:
+            forecast_html = html.escape(forecast_details).replace('\n', '<br>')
+        html_body = html_template.format(
+            recommendation=recommendation,
+            reason_html=reason_html,
+            location=html.escape(location),
+            forecast_html=forecast_html,
+            timestamp=timestamp
+        )
 
-    html_body = f"""
-<html>
-<head>
-<style>
-    body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-    .header {{ background-color: {'#4a90e2' if needs_umbrella else '#f39c12'}; color: white; padding: 20px; text-align: center; }}
-    .content {{ padding: 20px; }}
-    .recommendation {{ font-size: 24px; font-weight: bold; color: {'#e74c3c' if needs_umbrella else '#27ae60'}; }}
-    .reason {{ background-color: #f5f5f5; padding: 15px; margin: 15px 0; border-left: 4px solid {'#e74c3c' if needs_umbrella else '#27ae60'}; }}
-    .forecast {{ background-color: #f9f9f9; padding: 15px; margin: 15px 0; }}
-    .footer {{ font-size: 12px; color: #999; margin-top: 20px; padding-top: 20px; border-top: 1px solid #ddd; }}
-</style>
-</head>
-<body>
-    <div class="header">
-        <h1>{emoji} Umbrella Advisor</h1>
-        <p>Daily Weather Report for {location}</p>
-    </div>
-    <div class="content">
-        <p class="recommendation">{recommendation}</p>
-        <div class="reason">
-            <strong>Why?</strong><br>
-            {reason.replace(chr(10), '<br>')}
-        </div>
-        <div class="forecast">
-            <strong>Today's Forecast:</strong><br>
-            {forecast_details.replace(chr(10), '<br>')}
-        </div>
-    </div>
-    <div class="footer">
-        Report generated at: {datetime.now().strftime('%Y-%m-%d %I:%M %p')}
-    </div>
-</body>
-</html>
-"""
+    # Create message
+    if email_format == 'text':
+        msg = MIMEText(text_body, 'plain', 'utf-8')
+    elif email_format == 'html':
+        msg = MIMEText(html_body, 'html', 'utf-8')
+    else:
+        msg = MIMEMultipart('alternative')
+        msg.attach(MIMEText(text_body, 'plain'))
+        msg.attach(MIMEText(html_body, 'html'))
 
-    # Attach both versions
-    part1 = MIMEText(text_body, 'plain')
-    part2 = MIMEText(html_body, 'html')
-    msg.attach(part1)
-    msg.attach(part2)
+    msg['Subject'] = subject
+    msg['From'] = sender_email
+    msg['To'] = ', '.join(recipients)
 
     # Send email
-    with smtplib.SMTP(smtp_server, smtp_port) as server:
-        server.starttls()
-        server.login(sender_email, sender_password)
-        server.send_message(msg)
+    if server is not None:
+        server.send_message(msg, from_addr=sender_email, to_addrs=recipients)
+    else:
+        with _open_smtp(smtp_server, smtp_port, sender_email, sender_password) as server:
+            server.send_message(msg, from_addr=sender_email, to_addrs=recipients)
 
 
-def main():
-    """Main function to orchestrate weather check and email notification"""
+async def main_async():
+    """Main coroutine to orchestrate weather check and email notification"""
 
     # Get configuration from environment variables
     weather_api_key = os.environ.get('WEATHER_API_KEY')
@@ -271,21 +643,49 @@ def main():
     if missing_vars:
         raise ValueError(f"Missing required environment variables: {', '.join(missing_vars)}")
 
+    # Fetch the forecast and open the SMTP connection concurrently so the
+    # STARTTLS + AUTH handshake overlaps with the weather API round trips
     print(f"Fetching weather for {location}...")
-    weather_data, location_name = get_weather_forecast(weather_api_key, location)
-
-    print("Analyzing weather conditions...")
-    needs_umbrella, reason, forecast_details = analyze_weather(weather_data)
-
-    print(f"Sending email to {recipient_email}...")
-    send_email(
-        smtp_server, smtp_port, sender_email, sender_password, recipient_email,
-        needs_umbrella, reason, forecast_details, location_name
+    weather_task = asyncio.create_task(
+        asyncio.to_thread(get_weather_forecast, weather_api_key, location, get_session())
     )
+    mailer = SMTPMailer(smtp_server, smtp_port, sender_email, sender_password)
+    smtp_task = asyncio.create_task(asyncio.to_thread(mailer.connect))
+    (weather_data, location_name), _ = await asyncio.gather(weather_task, smtp_task)
+
+    try:
+        print("Analyzing weather conditions...")
+        needs_umbrella, reason, forecast_details, reason_html, forecast_html = analyze_weather(weather_data)
+
+        # Re-sending an identical recommendation (retry, same-day re-run)
+        # is wasted SMTP traffic - skip when today's digest matches the
+        # last one sent, unless FORCE_SEND overrides
+        digest = hashlib.blake2b(
+            f"{datetime.now():%Y-%m-%d}|{location_name}|{needs_umbrella}|{forecast_details}".encode(),
+            digest_size=8
+        ).hexdigest()
+        last_sent = _read_cache_file(_LAST_DIGEST_PATH) or {}
+        if last_sent.get('digest') == digest and not os.environ.get('FORCE_SEND'):
+            print("Recommendation unchanged since last send - skipping email")
+        else:
+            print(f"Sending email to {recipient_email}...")
+            send_email(
+                smtp_server, smtp_port, sender_email, sender_password, recipient_email,
+                needs_umbrella, reason, forecast_details, location_name,
+                reason_html=reason_html, forecast_html=forecast_html, server=mailer
+            )
+            _write_cache_file(_LAST_DIGEST_PATH, {'digest': digest})
+            print("✓ Email sent successfully!")
+    finally:
+        mailer.close()
 
-    print("✓ Email sent successfully!")
     print(f"Recommendation: {'BRING UMBRELLA' if needs_umbrella else 'NO UMBRELLA NEEDED'}")
 
 
+def main():
+    """Entry point - runs the async pipeline"""
+    asyncio.run(main_async())
+
+
 if __name__ == '__main__':
     main()